@@ -1,110 +1,307 @@
 import os
+import numpy as np
 import pandas as pd
 import psycopg2
+import psycopg2.extras
+from concurrent.futures import ThreadPoolExecutor
+from psycopg2.pool import ThreadedConnectionPool
 import logging
 import time
+from decimal import Decimal
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
-
-# Database connection info from environment variables
-DB_HOST = os.getenv('DB_HOST')
-DB_PORT = os.getenv('DB_PORT')
-DB_NAME = os.getenv('DB_NAME')
-DB_USER = os.getenv('DB_USER')
-DB_PASSWORD = os.getenv('DB_PASSWORD')
-
-# Set up logging
-log_folder = 'logs'
-if not os.path.exists(log_folder):
-    os.makedirs(log_folder)
-log_filename = os.path.join(log_folder, f'run_{time.strftime("%Y%m%d_%H%M%S")}.log')
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_filename),
-        logging.StreamHandler()
-    ]
-)
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # pyarrow is optional
+    pa = None
+
+try:
+    from pgcopy import CopyManager
+except ImportError:  # pgcopy is optional
+    CopyManager = None
+
+# Batch sizes for the bulk load paths
+INSERT_PAGE_SIZE = 10000
+COPY_SLICE_ROWS = 50000
+
+# Connection pool bounds; each table is loaded on its own connection, up to LOAD_WORKERS at once
+LOAD_WORKERS = 4
+POOL_MIN_CONN = LOAD_WORKERS
+POOL_MAX_CONN = 8
+
+# Keys are added after the bulk load so PostgreSQL builds each index in one pass
+# instead of checking every inserted row; names match PostgreSQL's defaults
+TABLE_CONSTRAINTS = [
+    ('onlineretail.customers', 'customers_pkey', 'PRIMARY KEY (customerid)'),
+    ('onlineretail.products', 'products_pkey', 'PRIMARY KEY (stockcode)'),
+    ('onlineretail.orders', 'orders_pkey', 'PRIMARY KEY (invoiceno)'),
+    ('onlineretail.orderdetails', 'orderdetails_pkey', 'PRIMARY KEY (orderdetailid)'),
+    ('onlineretail.orders', 'orders_customerid_fkey', 'FOREIGN KEY (customerid) REFERENCES onlineretail.customers(customerid)'),
+    ('onlineretail.orderdetails', 'orderdetails_invoiceno_fkey', 'FOREIGN KEY (invoiceno) REFERENCES onlineretail.orders(invoiceno)'),
+    ('onlineretail.orderdetails', 'orderdetails_stockcode_fkey', 'FOREIGN KEY (stockcode) REFERENCES onlineretail.products(stockcode)')
+]
+
+# Column types of the source CSV, declared up front so the readers skip type inference
+CSV_DTYPES = {
+    'InvoiceNo': 'string',
+    'StockCode': 'string',
+    'Description': 'string',
+    'Quantity': 'Int32',
+    'UnitPrice': 'float64',
+    'CustomerID': 'Int32',
+    'Country': 'category'
+}
+DATE_FORMAT = '%m/%d/%Y %H:%M'
+
+LOG_FOLDER = 'logs'
+
+# Module logger; handlers are installed on the root logger by configure()
+logger = logging.getLogger(__name__)
+
+def configure():
+    """
+    Load environment variables and set up logging to the console and a per-run log file.
+    Handlers are only installed on the first call, so later calls share them; the INFO
+    level is set every time, even when handlers were installed by someone else.
+    """
+    load_dotenv()
+    root = logging.getLogger()
+    if not root.handlers:
+        os.makedirs(LOG_FOLDER, exist_ok=True)
+        log_filename = os.path.join(LOG_FOLDER, f'run_{time.strftime("%Y%m%d_%H%M%S")}.log')
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s',
+            handlers=[
+                logging.FileHandler(log_filename),
+                logging.StreamHandler()
+            ]
+        )
+    root.setLevel(logging.INFO)
 
 def connect_to_db():
-    """Connect to PostgreSQL database."""
+    """Create a pool of connections to the PostgreSQL database."""
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
+        pool = ThreadedConnectionPool(
+            POOL_MIN_CONN,
+            POOL_MAX_CONN,
+            host=os.getenv('DB_HOST'),
+            port=os.getenv('DB_PORT'),
+            database=os.getenv('DB_NAME'),
+            user=os.getenv('DB_USER'),
+            password=os.getenv('DB_PASSWORD')
         )
-        logging.info("Connected to the database.")
-        return conn
+        logger.info("Connected to the database.")
+        return pool
     except Exception as e:
-        logging.error(f"Error connecting to the database: {e}")
+        logger.error(f"Error connecting to the database: {e}")
         raise
 
+def run_with_connection(pool, func, *args):
+    """Borrow a connection from the pool, call func(conn, *args) and return the connection."""
+    conn = pool.getconn()
+    try:
+        return func(conn, *args)
+    finally:
+        pool.putconn(conn)
+
 def create_tables(conn):
-    """Create tables in PostgreSQL."""
+    """
+    Create tables in PostgreSQL without keys; add_constraints adds them after loading.
+    New tables are unlogged so the bulk load skips the WAL; set_logged makes them durable.
+    """
     try:
         start = time.time()
         with conn.cursor() as cur:
             cur.execute("""
-            CREATE TABLE IF NOT EXISTS onlineretail.customers (
-                customerid INT PRIMARY KEY,
+            CREATE UNLOGGED TABLE IF NOT EXISTS onlineretail.customers (
+                customerid INT,
                 country VARCHAR(100)
             );
             
-            CREATE TABLE IF NOT EXISTS onlineretail.products (
-                stockcode VARCHAR(20) PRIMARY KEY,
+            CREATE UNLOGGED TABLE IF NOT EXISTS onlineretail.products (
+                stockcode VARCHAR(20),
                 description TEXT,
                 unitprice NUMERIC
             );
             
-            CREATE TABLE IF NOT EXISTS onlineretail.orders (
-                invoiceno VARCHAR(20) PRIMARY KEY,
-                customerid INT REFERENCES onlineretail.customers(customerid),
+            CREATE UNLOGGED TABLE IF NOT EXISTS onlineretail.orders (
+                invoiceno VARCHAR(20),
+                customerid INT,
                 invoicedate TIMESTAMP
             );
             
-            CREATE TABLE IF NOT EXISTS onlineretail.orderdetails (
-                orderdetailid INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
-                invoiceno VARCHAR(20) REFERENCES onlineretail.orders(invoiceno),
-                stockcode VARCHAR(20) REFERENCES onlineretail.products(stockcode),
+            CREATE UNLOGGED TABLE IF NOT EXISTS onlineretail.orderdetails (
+                orderdetailid INTEGER GENERATED ALWAYS AS IDENTITY,
+                invoiceno VARCHAR(20),
+                stockcode VARCHAR(20),
                 quantity INT,
                 unitprice NUMERIC
             );
             """)
             conn.commit()
-            logging.info("Tables created successfully.")
-            logging.info(f"Tables creation took {time.time() - start:.2f} seconds.")
+            logger.info("Tables created successfully.")
+            logger.info(f"Tables creation took {time.time() - start:.2f} seconds.")
     except Exception as e:
         conn.rollback()
-        logging.error(f"Error creating tables: {e}")
+        logger.error(f"Error creating tables: {e}")
         raise
 
-def extract_data(file_path):
+def set_logged(conn):
+    """Switch the tables to logged, writing each one to the WAL in a single pass after the load."""
+    try:
+        start = time.time()
+        with conn.cursor() as cur:
+            for table in ('customers', 'products', 'orders', 'orderdetails'):
+                cur.execute(f"ALTER TABLE onlineretail.{table} SET LOGGED;")
+            conn.commit()
+            logger.info("Tables set to logged.")
+            logger.info(f"Setting tables to logged took {time.time() - start:.2f} seconds.")
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error setting tables to logged: {e}")
+        raise
+
+def existing_constraints(conn):
+    """Return the names of the constraints already defined in the onlineretail schema."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT conname FROM pg_constraint WHERE connamespace = 'onlineretail'::regnamespace;")
+        return {row[0] for row in cur.fetchall()}
+
+def clear_unkeyed_tables(conn):
+    """
+    Empty the tables if they hold rows but have no keys, as left by a run that stopped before
+    add_constraints. Without keys ON CONFLICT has nothing to check, so reloading would duplicate those rows.
     """
-    Extract CSV data into a pandas DataFrame.
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT EXISTS (SELECT 1 FROM onlineretail.customers)
+                    OR EXISTS (SELECT 1 FROM onlineretail.products)
+                    OR EXISTS (SELECT 1 FROM onlineretail.orders)
+                    OR EXISTS (SELECT 1 FROM onlineretail.orderdetails);
+            """)
+            if cur.fetchone()[0]:
+                cur.execute("TRUNCATE onlineretail.customers, onlineretail.products, onlineretail.orders, onlineretail.orderdetails;")
+                logger.warning("Tables held rows from an incomplete run without keys; truncated them before loading.")
+            conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error clearing tables: {e}")
+        raise
+
+def add_constraints(conn):
+    """Add the primary and foreign keys from TABLE_CONSTRAINTS that do not exist yet."""
+    try:
+        start = time.time()
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL maintenance_work_mem = '1GB';")
+            existing = existing_constraints(conn)
+            for table, name, definition in TABLE_CONSTRAINTS:
+                if name not in existing:
+                    cur.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition};")
+            conn.commit()
+            logger.info("Constraints added successfully.")
+            logger.info(f"Constraints creation took {time.time() - start:.2f} seconds.")
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error adding constraints: {e}")
+        raise
+
+def parse_invoice_dates(dates):
+    """
+    Parse 'InvoiceDate' strings with DATE_FORMAT, once per distinct string.
+    Parameters:
+        dates (Series): The raw 'InvoiceDate' strings.
+    Returns:
+        Series: The parsed dates, with NaT for values that are missing or do not match DATE_FORMAT.
+    """
+    return pd.to_datetime(dates, format=DATE_FORMAT, errors='coerce', cache=True)
+
+def read_csv_pyarrow(file_path):
+    """
+    Read the CSV with the multithreaded pyarrow reader.
     Parameters:
         file_path (str): The path to the CSV file to be loaded.
     Returns:
+        DataFrame: A pandas DataFrame with the columns typed as in CSV_DTYPES.
+    """
+    convert_options = pa_csv.ConvertOptions(
+        column_types={
+            'InvoiceNo': pa.string(),
+            'StockCode': pa.string(),
+            'Description': pa.string(),
+            # Read as floats so exports like '17850.0' parse; astype(CSV_DTYPES) casts them to Int32
+            'Quantity': pa.float64(),
+            # Parsed below like the C engine's fallback, so a bad date is treated as missing in both paths
+            'InvoiceDate': pa.string(),
+            'UnitPrice': pa.float64(),
+            'CustomerID': pa.float64(),
+            'Country': pa.string()
+        },
+        strings_can_be_null=True
+    )
+    table = pa_csv.read_csv(file_path, convert_options=convert_options)
+    df = table.to_pandas().astype(CSV_DTYPES)
+    df['InvoiceDate'] = parse_invoice_dates(df['InvoiceDate'])
+    return df
+
+def read_csv_pandas(file_path, chunksize=None):
+    """
+    Read the CSV with the pandas C engine.
+    Parameters:
+        file_path (str): The path to the CSV file to be loaded.
+        chunksize (int): Number of rows per DataFrame, or None to read the whole file.
+    Returns:
+        DataFrame or TextFileReader: The loaded data, or an iterator of chunks if chunksize is set.
+    """
+    return pd.read_csv(
+        file_path,
+        dtype=CSV_DTYPES,
+        parse_dates=['InvoiceDate'],
+        date_format=DATE_FORMAT,
+        cache_dates=True,
+        low_memory=False,
+        chunksize=chunksize
+    )
+
+def extract_data(file_path, chunksize=None):
+    """
+    Extract CSV data into pandas DataFrames.
+    Parameters:
+        file_path (str): The path to the CSV file to be loaded.
+        chunksize (int): Number of rows per DataFrame. If None, the whole file is yielded as one DataFrame.
+    Yields:
         DataFrame: A pandas DataFrame containing the loaded data.
     """
     try:
         start = time.time()
-        df = pd.read_csv(file_path)
-        logging.info(f"Data extracted successfully from CSV. DataFrame Shape: {df.shape}.")
-        logging.info(f"Data extracting took {time.time() - start:.2f} seconds.")
-        return df
+        if chunksize is not None:
+            # pyarrow's streaming reader splits by bytes rather than rows, so chunks use the C engine
+            with read_csv_pandas(file_path, chunksize=chunksize) as reader:
+                for df in reader:
+                    logger.info(f"Chunk extracted successfully from CSV. DataFrame Shape: {df.shape}.")
+                    yield df
+            return
+        if pa is not None:
+            df = read_csv_pyarrow(file_path)
+        else:
+            # pyarrow is optional; fall back to the C engine
+            logger.info("pyarrow not installed, reading CSV with the C engine.")
+            df = read_csv_pandas(file_path)
+        logger.info(f"Data extracted successfully from CSV. DataFrame Shape: {df.shape}.")
+        logger.info(f"Data extracting took {time.time() - start:.2f} seconds.")
+        yield df
     except Exception as e:
-        logging.error(f"Error extracting CSV file: {e}")
+        logger.error(f"Error extracting CSV file: {e}")
         raise
 
 def transform_data(df):
     """
     Transform data types and handle missing values.
+    Missing values are backfilled from other rows of the same DataFrame, so when the CSV
+    is streamed in chunks only rows of the same chunk are used.
     Parameters:
         df (DataFrame): A pandas DataFrame containing the untransformed data.
     Returns:
@@ -115,139 +312,323 @@ def transform_data(df):
         df.dropna(subset=['InvoiceNo'], inplace=True)
 
         # Assuming -1 as placeholder for missing customer IDs
-        df['CustomerID'] = df['CustomerID'].fillna(-1).astype(int)
+        df['CustomerID'] = df['CustomerID'].fillna(-1)
+
+        # 'InvoiceDate' is parsed on read, but the C engine leaves the column as strings if any value
+        # does not match DATE_FORMAT; parse it then, treating bad values as missing like the pyarrow path
+        if not pd.api.types.is_datetime64_any_dtype(df['InvoiceDate']):
+            df['InvoiceDate'] = parse_invoice_dates(df['InvoiceDate'])
 
         # Handle missing 'StockCode' and 'Description'
         df.dropna(subset=['StockCode', 'Description'], how='all', inplace=True)     # Drop rows where both 'StockCode' and 'Description' are missing
-        mapping = df[['StockCode', 'Description']].dropna().drop_duplicates()       # Create a dataframe for mapping, removing missing and duplicate values
-        description_fill = dict(zip(mapping['StockCode'], mapping['Description']))  # Create a mapping dictionary for filling 'Description'
-        stockcode_fill = dict(zip(mapping['Description'], mapping['StockCode']))    # Create a mapping dictionary for filling 'StockCode'
-        df['Description'] = df['Description'].fillna(df['StockCode'].map(description_fill)) # Handle missing 'Description' based on 'StockCode'
-        df['StockCode'] = df['StockCode'].fillna(df['Description'].map(stockcode_fill))     # Handle missing 'StockCode' based on 'Description'
+        # Every remaining row has at least one of the two, so both sides can be filled from the same
+        # mapping, and a side's mapping is only built when that side actually has gaps
+        missing = df[['StockCode', 'Description']].isna()                           # Flag the rows that need filling on either side
+        if missing.any(axis=None):
+            mapping = df[['StockCode', 'Description']].dropna()                     # Create a dataframe for mapping, removing missing values
+            if missing['Description'].any():
+                description_fill = mapping.drop_duplicates('StockCode').set_index('StockCode')['Description']   # Create a mapping Series for filling 'Description'
+                df.loc[missing['Description'], 'Description'] = df.loc[missing['Description'], 'StockCode'].map(description_fill).astype('string') # Handle missing 'Description' based on 'StockCode'
+            if missing['StockCode'].any():
+                stockcode_fill = mapping.drop_duplicates('Description').set_index('Description')['StockCode']   # Create a mapping Series for filling 'StockCode'
+                df.loc[missing['StockCode'], 'StockCode'] = df.loc[missing['StockCode'], 'Description'].map(stockcode_fill).astype('string')     # Handle missing 'StockCode' based on 'Description'
 
-        # Fill missing 'Quantity' with 0
-        df['Quantity'] = df['Quantity'].fillna(0).astype(int)
+        # Fill missing 'Quantity' with 0; the numeric dtypes are set on read
+        df['Quantity'] = df['Quantity'].fillna(0)
 
         # Fill missing 'UnitPrice' with 0
-        df['UnitPrice'] = df['UnitPrice'].fillna(0).astype(float)
+        df['UnitPrice'] = df['UnitPrice'].fillna(0)
 
-        # Handle missing 'InvoiceDate' based on 'InvoiceNo'
-        # Create a Series with unique InvoiceNo and corresponding InvoiceDate
-        invoice_date_fill = df[['InvoiceNo', 'InvoiceDate']].dropna().drop_duplicates().set_index('InvoiceNo')['InvoiceDate']
-
-        # If 'InvoiceNo' is unique, map directly to fill missing InvoiceDate
-        if invoice_date_fill.index.is_unique:
-            df['InvoiceDate'] = df['InvoiceDate'].fillna(df['InvoiceNo'].map(invoice_date_fill))
-        # If there are multiple 'InvoiceDate' values for one 'InvoiceNo', use the first occurrence of 'InvoiceDate'
-        else:
-            invoice_date_fill = invoice_date_fill.groupby(invoice_date_fill.index).first()
-            df['InvoiceDate'] = df['InvoiceDate'].fillna(df['InvoiceNo'].map(invoice_date_fill))
+        # Handle missing 'InvoiceDate' based on 'InvoiceNo', using the first 'InvoiceDate' of each invoice
+        # The per-invoice dates are only computed when a date is missing, and looked up only for those rows
+        missing = df['InvoiceDate'].isna()
+        if missing.any():
+            invoice_date_fill = df.groupby('InvoiceNo', sort=False)['InvoiceDate'].first()
+            df.loc[missing, 'InvoiceDate'] = df.loc[missing, 'InvoiceNo'].map(invoice_date_fill)
 
-        # Fill any remaining missing 'InvoiceDate' with default value
-        df['InvoiceDate'] = df['InvoiceDate'].fillna('1/1/2010 00:00:00 AM')
-        df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'], format='%m/%d/%Y %H:%M')
+            # Fill any remaining missing 'InvoiceDate' with default value
+            df['InvoiceDate'] = df['InvoiceDate'].fillna(pd.Timestamp('2010-01-01'))
 
-        logging.info("Data transformation completed.")
+        logger.info("Data transformation completed.")
         return df
     except Exception as e:
-        logging.error(f"Error transforming data: {e}")
+        logger.error(f"Error transforming data: {e}")
         raise
 
-def load_data(conn, df):
-    """Insert data into PostgreSQL with independent transactions for each table."""
-    
-    # Insert into customers
+class DataFrameCSVReader:
+    """
+    Read-only file-like object that serializes a DataFrame to tab-separated CSV one slice
+    of rows at a time, so COPY never holds more than a slice of the table as text.
+    """
+
+    def __init__(self, df, slice_rows=COPY_SLICE_ROWS):
+        self._slices = (df.iloc[i:i + slice_rows] for i in range(0, len(df), slice_rows))
+        self._buffer = ''
+        self._position = 0
+
+    def read(self, size=-1):
+        """Return up to `size` characters; an empty string signals the end of the data."""
+        if self._position >= len(self._buffer):
+            rows = next(self._slices, None)
+            if rows is None:
+                return ''
+            self._buffer = rows.to_csv(index=False, header=False, sep='\t', na_rep='\\N')
+            self._position = 0
+        end = len(self._buffer) if size is None or size < 0 else self._position + size
+        data = self._buffer[self._position:end]
+        self._position += len(data)
+        return data
+
+def copy_dataframe(cur, df, table, columns):
+    """
+    Stream a DataFrame into a table with a single COPY FROM STDIN command.
+    Parameters:
+        cur (cursor): An open psycopg2 cursor.
+        df (DataFrame): The rows to copy, with columns in the same order as `columns`.
+        table (str): The (optionally schema-qualified) target table.
+        columns (list): The target column names.
+    """
+    cur.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, DELIMITER E'\\t', NULL '\\N')",
+        DataFrameCSVReader(df)
+    )
+
+def binary_copy_records(df):
+    """
+    Yield the rows of a DataFrame as tuples for pgcopy, one slice of COPY_SLICE_ROWS at a time.
+    Missing values become None and float columns become Decimal, which pgcopy requires for NUMERIC;
+    each distinct float is converted once and broadcast to its rows by its factorized code.
+    Parameters:
+        df (DataFrame): The rows to copy.
+    Yields:
+        tuple: One row of Python values.
+    """
+    decimals = {}
+    for column in df.select_dtypes('float').columns:
+        codes, uniques = pd.factorize(df[column])
+        # Code -1 marks a missing value and picks the trailing None
+        values = np.array([Decimal(v) for v in uniques.astype(str)] + [None], dtype=object)
+        decimals[column] = values[codes]
+    for start in range(0, len(df), COPY_SLICE_ROWS):
+        rows = df.iloc[start:start + COPY_SLICE_ROWS]
+        records = rows.astype(object).where(rows.notna(), None)
+        for column, values in decimals.items():
+            records[column] = values[start:start + COPY_SLICE_ROWS]
+        yield from records.itertuples(index=False, name=None)
+
+def copy_dataframe_binary(cur, df, table, columns):
+    """
+    Stream a DataFrame into a table with COPY ... (FORMAT BINARY) through pgcopy,
+    which spares the server the text-to-type conversion of CSV COPY.
+    pgcopy spools the encoded rows to a temporary file on disk before sending them, so
+    memory use stays at one slice of rows from binary_copy_records.
+    Parameters:
+        cur (cursor): An open psycopg2 cursor.
+        df (DataFrame): The rows to copy, with columns in the same order as `columns`.
+        table (str): The (optionally schema-qualified) target table.
+        columns (list): The target column names.
+    """
+    manager = CopyManager(cur.connection, table, columns)
+    manager.copy(binary_copy_records(df))
+
+def insert_dataframe(cur, df, table, columns):
+    """
+    Insert a DataFrame into a table with batched multi-row INSERT statements.
+    Parameters:
+        cur (cursor): An open psycopg2 cursor.
+        df (DataFrame): The rows to insert, with columns in the same order as `columns`.
+        table (str): The (optionally schema-qualified) target table.
+        columns (list): The target column names.
+    """
+    records = df.astype(object).where(df.notna(), None)
+    psycopg2.extras.execute_values(
+        cur,
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s",
+        records.itertuples(index=False, name=None),
+        page_size=INSERT_PAGE_SIZE
+    )
+
+def write_dataframe(cur, df, table, columns):
+    """
+    Write a DataFrame into a table using the LOAD_METHOD environment variable: 'copy' (default),
+    'binary' for binary COPY through pgcopy, or 'insert' for servers where COPY is not permitted.
+    """
+    load_method = os.getenv('LOAD_METHOD', 'copy')
+    if load_method == 'insert':
+        insert_dataframe(cur, df, table, columns)
+    elif load_method == 'binary' and CopyManager is not None:
+        copy_dataframe_binary(cur, df, table, columns)
+    else:
+        if load_method == 'binary':
+            # pgcopy is optional; fall back to text COPY
+            logger.warning("pgcopy not installed, loading with text COPY.")
+        copy_dataframe(cur, df, table, columns)
+
+def insert_new_rows(cur, df, table, columns, key):
+    """
+    Write a DataFrame into a temporary staging table, then insert it into the target
+    table keeping one row per key. Rows that conflict with existing keys are only skipped
+    once add_constraints has added the keys; before that, ON CONFLICT has no index to check.
+    Parameters:
+        cur (cursor): An open psycopg2 cursor.
+        df (DataFrame): The rows to insert, with columns in the same order as `columns`.
+        table (str): The schema-qualified target table.
+        columns (list): The target column names.
+        key (str): The primary key column used for deduplication.
+    Returns:
+        int: The number of rows inserted into the target table.
+    """
+    staging = f"stg_{table.split('.')[-1]}"
+    column_list = ', '.join(columns)
+    cur.execute(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP;")
+    write_dataframe(cur, df, staging, columns)
+    cur.execute(f"""
+        INSERT INTO {table} ({column_list})
+        SELECT DISTINCT ON ({key}) {column_list} FROM {staging}
+        ON CONFLICT DO NOTHING;
+    """)
+    return cur.rowcount
+
+def load_customers(conn, customers):
+    """Load customers in their own transaction."""
     try:
         start = time.time()
         with conn.cursor() as cur:
-            customers = df[['CustomerID', 'Country']].drop_duplicates()
-            for index, row in customers.iterrows():
-                cur.execute("""
-                    INSERT INTO onlineretail.customers (customerid, country)
-                    VALUES (%s, %s)
-                    ON CONFLICT (customerid) DO NOTHING;
-                """, (row['CustomerID'], row['Country']))
-            conn.commit()  # Commit after inserting customers
-            logging.info(f"{len(customers)} customers inserted.")
-            logging.info(f"Customers insertion took {time.time() - start:.2f} seconds.")
+            cur.execute("SET LOCAL synchronous_commit = OFF;")
+            inserted = insert_new_rows(cur, customers, 'onlineretail.customers', ['customerid', 'country'], 'customerid')
+            conn.commit()  # Commit after loading customers
+            logger.info(f"{inserted} customers inserted.")
+            logger.info(f"Customers loading took {time.time() - start:.2f} seconds.")
     except Exception as e:
-        logging.error(f"Error inserting customers: {e}")
-    
-    # Insert into products
+        conn.rollback()
+        logger.error(f"Error loading customers: {e}")
+
+def load_products(conn, products):
+    """Load products in their own transaction."""
     try:
         start = time.time()
         with conn.cursor() as cur:
-            products = df[['StockCode', 'Description', 'UnitPrice']].drop_duplicates()
-            for index, row in products.iterrows():
-                cur.execute("""
-                    INSERT INTO onlineretail.products (stockcode, description, unitprice)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (stockcode) DO NOTHING;
-                """, (row['StockCode'], row['Description'], row['UnitPrice']))
-            conn.commit()  # Commit after inserting products
-            logging.info(f"{len(products)} products inserted.")
-            logging.info(f"Products insertion took {time.time() - start:.2f} seconds.")
+            cur.execute("SET LOCAL synchronous_commit = OFF;")
+            inserted = insert_new_rows(cur, products, 'onlineretail.products', ['stockcode', 'description', 'unitprice'], 'stockcode')
+            conn.commit()  # Commit after loading products
+            logger.info(f"{inserted} products inserted.")
+            logger.info(f"Products loading took {time.time() - start:.2f} seconds.")
     except Exception as e:
-        logging.error(f"Error inserting products: {e}")
-    
-    # Insert into orders
+        conn.rollback()
+        logger.error(f"Error loading products: {e}")
+
+def load_orders(conn, orders):
+    """Load orders in their own transaction."""
     try:
         start = time.time()
         with conn.cursor() as cur:
-            orders = df[['InvoiceNo', 'CustomerID', 'InvoiceDate']].drop_duplicates()
-            for index, row in orders.iterrows():
-                cur.execute("""
-                    INSERT INTO onlineretail.orders (invoiceno, customerid, invoicedate)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (invoiceno) DO NOTHING;
-                """, (row['InvoiceNo'], row['CustomerID'], row['InvoiceDate']))
-            conn.commit()  # Commit after inserting orders
-            logging.info(f"{len(orders)} orders inserted.")
-            logging.info(f"Orders insertion took {time.time() - start:.2f} seconds.")
+            cur.execute("SET LOCAL synchronous_commit = OFF;")
+            inserted = insert_new_rows(cur, orders, 'onlineretail.orders', ['invoiceno', 'customerid', 'invoicedate'], 'invoiceno')
+            conn.commit()  # Commit after loading orders
+            logger.info(f"{inserted} orders inserted.")
+            logger.info(f"Orders loading took {time.time() - start:.2f} seconds.")
     except Exception as e:
-        logging.error(f"Error inserting orders: {e}")
-    
-    # Insert into orderdetails
+        conn.rollback()
+        logger.error(f"Error loading orders: {e}")
+
+def load_order_details(conn, order_details):
+    """Load order details in their own transaction."""
     try:
         start = time.time()
         with conn.cursor() as cur:
-            order_details = df[['InvoiceNo', 'StockCode', 'Quantity', 'UnitPrice']]
-            for index, row in order_details.iterrows():
-                cur.execute("""
-                    INSERT INTO onlineretail.orderdetails (invoiceno, stockcode, quantity, unitprice)
-                    VALUES (%s, %s, %s, %s);
-                """, (row['InvoiceNo'], row['StockCode'], row['Quantity'], row['UnitPrice']))
-            conn.commit()  # Commit after inserting orderdetails
-            logging.info(f"{len(order_details)} order details inserted.")
-            logging.info(f"Order details insertion took {time.time() - start:.2f} seconds.")
+            cur.execute("SET LOCAL synchronous_commit = OFF;")
+            write_dataframe(cur, order_details, 'onlineretail.orderdetails', ['invoiceno', 'stockcode', 'quantity', 'unitprice'])
+            conn.commit()  # Commit after loading orderdetails
+            logger.info(f"{len(order_details)} order details inserted.")
+            logger.info(f"Order details loading took {time.time() - start:.2f} seconds.")
     except Exception as e:
-        logging.error(f"Error inserting order details: {e}")
+        conn.rollback()
+        logger.error(f"Error loading order details: {e}")
+
+def drop_seen_keys(df, key, seen):
+    """
+    Drop rows whose key was already loaded from an earlier chunk, then record the remaining keys.
+    Parameters:
+        df (DataFrame): A pandas DataFrame with one row per key.
+        key (str): The key column.
+        seen (set): The keys loaded so far; updated in place.
+    Returns:
+        DataFrame: The rows whose keys have not been loaded yet.
+    """
+    df = df[~df[key].isin(seen)]
+    seen.update(df[key])
+    return df
+
+def load_data(pool, df, seen_keys=None, foreign_keys=False):
+    """
+    Load data into PostgreSQL in bulk, using independent transactions for each table.
+    Without foreign keys all four tables are loaded concurrently. When the foreign keys
+    are already in place, customers and products are loaded concurrently first, then
+    orders, then order details, so every referenced row is committed before it is used.
+    Parameters:
+        pool (ThreadedConnectionPool): The pool to borrow connections from.
+        df (DataFrame): A pandas DataFrame containing the transformed data.
+        seen_keys (dict): Optional sets of 'CustomerID', 'StockCode' and 'InvoiceNo' values loaded
+            from earlier chunks, used to skip rows that are already in the database.
+        foreign_keys (bool): Whether the foreign keys already exist on the tables.
+    """
+    customers = df[['CustomerID', 'Country']].groupby('CustomerID', as_index=False, sort=False).first()
+    products = df[['StockCode', 'Description', 'UnitPrice']].groupby('StockCode', as_index=False, sort=False).first()
+    orders = df[['InvoiceNo', 'CustomerID', 'InvoiceDate']].groupby('InvoiceNo', as_index=False, sort=False).first()
+    order_details = df[['InvoiceNo', 'StockCode', 'Quantity', 'UnitPrice']]
+
+    if seen_keys is not None:
+        customers = drop_seen_keys(customers, 'CustomerID', seen_keys['CustomerID'])
+        products = drop_seen_keys(products, 'StockCode', seen_keys['StockCode'])
+        orders = drop_seen_keys(orders, 'InvoiceNo', seen_keys['InvoiceNo'])
+
+    loads = [
+        (load_customers, customers),
+        (load_products, products),
+        (load_orders, orders),
+        (load_order_details, order_details)
+    ]
+    stages = [loads[:2], loads[2:3], loads[3:]] if foreign_keys else [loads]
+
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+        for stage in stages:
+            futures = [executor.submit(run_with_connection, pool, load, frame) for load, frame in stage]
+            for future in futures:
+                future.result()
 
 def main():
+    configure()
     start_time = time.time()
-    # Extract
-    csv_path = os.path.join('Data', 'Online Retail.csv')
-    df = extract_data(csv_path)
-
-    # Transform
-    df = transform_data(df)
-    df.to_csv("temp.csv")
     
     # Connect to DB and create tables
-    conn = connect_to_db()
-    create_tables(conn)
+    pool = connect_to_db()
+    run_with_connection(pool, create_tables)
 
-    # Load data into the database
-    load_data(conn, df)
+    # Extract, transform and load the CSV one chunk at a time, then make the tables durable and add the keys
+    csv_path = os.path.join('Data', 'Online Retail.csv')
+    seen_keys = {'CustomerID': set(), 'StockCode': set(), 'InvoiceNo': set()}
+    # Rows per chunk; unset reads the whole file at once, which lets transform_data
+    # backfill missing values from anywhere in the file rather than only the chunk
+    chunk_size = int(os.getenv('CHUNK_SIZE')) if os.getenv('CHUNK_SIZE') else None
+    # Tables created by an earlier run already have their foreign keys, which fixes the load order
+    foreign_keys = bool(run_with_connection(pool, existing_constraints))
+    if not foreign_keys:
+        # Rows in unkeyed tables come from an interrupted run and would not be skipped on reload
+        run_with_connection(pool, clear_unkeyed_tables)
+    for df in extract_data(csv_path, chunk_size):
+        df = transform_data(df)
+        load_data(pool, df, seen_keys, foreign_keys)
+    run_with_connection(pool, set_logged)
+    run_with_connection(pool, add_constraints)
 
-    # Close connection
-    conn.close()
-    logging.info("Database connection closed.")
+    # Close connections
+    pool.closeall()
+    logger.info("Database connections closed.")
 
     # Timing the run
     end_time = time.time()
     total_time = end_time - start_time
-    logging.info(f"ETL process completed in {total_time:.2f} seconds.")
+    logger.info(f"ETL process completed in {total_time:.2f} seconds.")
 
 if __name__ == "__main__":
     main()